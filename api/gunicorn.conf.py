@@ -0,0 +1,19 @@
+# api/gunicorn.conf.py
+# Gunicorn settings for production: gevent workers, since every endpoint
+# spends its time waiting on YouTube or Gemini rather than on CPU.
+# Usage: gunicorn -c api/gunicorn.conf.py wsgi_app:app
+
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# The gevent worker monkey-patches sockets before the app is imported, so
+# requests, youtube-transcript-api and the Gemini client cooperate.
+worker_class = "gevent"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", 1000))
+
+# Summaries of long videos can take a while
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
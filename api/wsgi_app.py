@@ -2,45 +2,455 @@
 # Flask backend with Gemini, timestamp-citing answers, and Python 3.8/3.9-compatible typing
 
 import os
+
+# Standalone runs are served by gevent (see the entry point below), so patch
+# sockets before anything else imports them. Gunicorn's gevent worker patches
+# on its own, and the Flask debug server is left unpatched for its reloader.
+if __name__ == '__main__' and os.getenv('FLASK_DEBUG') != '1':
+    from gevent import monkey
+    monkey.patch_all()
+
+import datetime
+import functools
+import hashlib
 import logging
+import math
+import pickle
 import re
-from typing import Optional, List, Dict, Any
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from operator import itemgetter
+from typing import Optional, List, Dict, Any, Callable, Deque, Iterable, Iterator, Tuple
+from urllib.parse import urlparse, parse_qs
 
-from flask import Flask, request, jsonify
+import orjson
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
+from cachetools import LRUCache, TTLCache
 from dotenv import load_dotenv
+from diskcache import Cache, Disk
+from diskcache.core import UNKNOWN
+from selectolax.lexbor import LexborHTMLParser
 import google.generativeai as genai
+from google.generativeai import caching
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled
 import requests
+import zstandard
 
 # --- Configuration ---
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+# flask_cors logs every request at DEBUG; only turn that on when asked to
+logging.getLogger('flask_cors').setLevel(logging.DEBUG if os.getenv('DEBUG_CORS') else logging.WARNING)
+logging.getLogger('urllib3').setLevel(logging.WARNING)
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
-    logging.error("GEMINI_API_KEY not found in environment variables. Please set it.")
+    logger.error("GEMINI_API_KEY not found in environment variables. Please set it.")
+
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson, used by jsonify and request.get_json.
+
+    Responses such as extract-video-info carry the whole transcript, where
+    orjson's faster, whitespace-free encoding pays off.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # Hand orjson's bytes straight to the response; no str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)  # In production, scope this to your frontend origin.
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logging.getLogger('flask_cors').level = logging.DEBUG
+# Transcript-bearing JSON compresses ~4-6x; negotiated from Accept-Encoding.
+# Fast Brotli level (4), gzip for clients without br.
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['COMPRESS_BR_LEVEL'] = 4
+Compress(app)
+
+
+def sockets_are_cooperative() -> bool:
+    """True when gevent has monkey-patched sockets in this process."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
 
 try:
-    genai.configure(api_key=GEMINI_API_KEY)
+    # The default gRPC transport blocks in C and would stall every greenlet;
+    # REST goes through patched sockets and stays cooperative under gevent.
+    genai.configure(api_key=GEMINI_API_KEY, transport='rest' if sockets_are_cooperative() else None)
     model = genai.GenerativeModel('gemini-1.5-flash')
-    logging.info("Gemini model 'gemini-1.5-flash' initialized successfully.")
+    logger.info("Gemini model 'gemini-1.5-flash' initialized successfully.")
 except Exception as e:
     model = None
-    logging.error(f"Failed to initialize Gemini model: {e}")
+    logger.error("Failed to initialize Gemini model: %s", e)
+
+# Persistent cache for transcripts, metadata and generated summaries/topics.
+# SQLite-backed, so it is safe to share between Gunicorn worker processes.
+CACHE_DIR = os.getenv("TALK2YT_CACHE_DIR", os.path.expanduser("~/.talk2yt_cache"))
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+# Titles/descriptions get edited; transcripts practically never change
+METADATA_TTL_SECONDS = 24 * 3600
+TRANSCRIPT_TTL_SECONDS = 7 * 24 * 3600
+# Cached values (mostly transcript text) are stored zstd-compressed
+CACHE_COMPRESS_LEVEL = 3
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
 
-# Constants for transcript chunking
-MAX_TRANSCRIPT_LENGTH_CHARS = 12000
+class ZstdDisk(Disk):
+    """diskcache Disk that pickles values and zstd-compresses them; keys are untouched.
+
+    Entries written by the plain Disk are still readable, so an existing cache
+    directory keeps working and is compressed as entries get rewritten.
+    """
+
+    def __init__(self, directory: str, compress_level: int = CACHE_COMPRESS_LEVEL, **kwargs: Any) -> None:
+        self.compress_level = compress_level
+        super().__init__(directory, **kwargs)
+
+    def store(self, value: Any, read: bool, key: Any = UNKNOWN):
+        if not read:
+            # Compressor objects aren't thread-safe, and are cheap to create
+            value = zstandard.ZstdCompressor(level=self.compress_level).compress(
+                pickle.dumps(value, protocol=self.pickle_protocol))
+        return super().store(value, read, key=key)
+
+    def fetch(self, mode: int, filename: Optional[str], value: Any, read: bool) -> Any:
+        data = super().fetch(mode, filename, value, read)
+        if not read and isinstance(data, bytes) and data.startswith(ZSTD_MAGIC):
+            data = pickle.loads(zstandard.ZstdDecompressor().decompress(data))
+        return data
+
+
+try:
+    cache = Cache(CACHE_DIR, disk=ZstdDisk)
+    logger.info("Disk cache opened at %s", CACHE_DIR)
+except Exception as e:
+    cache = None
+    logger.error("Failed to open disk cache at %s, caching disabled: %s", CACHE_DIR, e)
+
+# Constants for transcript chunking. Gemini limits and bills by tokens, so
+# chunks are sized from a token budget; English text averages ~4 chars/token.
+# Transcripts longer than one chunk get their actual ratio measured with the
+# model's tokenizer (see chunk_chars_for), clamped to a sane range.
+CHARS_PER_TOKEN = 4
+MIN_CHARS_PER_TOKEN = 1.0
+MAX_CHARS_PER_TOKEN = 8.0
+MAX_CHUNK_TOKENS = 6000
+MAX_TRANSCRIPT_LENGTH_CHARS = MAX_CHUNK_TOKENS * CHARS_PER_TOKEN
 OVERLAP_CHARS = 500
+SUMMARY_OVERLAP_CHARS = 0
+# The ratio is measured on a prefix of the transcript, so a long video
+# doesn't send its whole text just to be counted
+TOKEN_COUNT_SAMPLE_CHARS = MAX_TRANSCRIPT_LENGTH_CHARS
+# A failed count falls back to CHARS_PER_TOKEN, remembered for this long
+TOKEN_COUNT_FAILURE_TTL_SECONDS = 3600
+
+# Chat retrieval: for long transcripts only the chunks closest to the query
+# (by Gemini embedding cosine similarity) are sent, instead of everything.
+EMBEDDING_MODEL = 'models/text-embedding-004'
+EMBED_BATCH_SIZE = 100  # batchEmbedContents limit
+CHAT_RETRIEVAL_MIN_CHARS = 60000
+# Retrieval chunks must fit the embedding model's 2,048-token input, and
+# timestamped transcript text runs ~3 chars/token; that also keeps top-K
+# selective. 6 x 6k chars sends about as much context as before.
+RETRIEVAL_CHUNK_CHARS = 6000
+CHAT_RETRIEVAL_TOP_K = 6
+# A transcript whose chunks failed to embed isn't retried on every chat turn
+EMBEDDING_FAILURE_TTL_SECONDS = 3600
+
+# Longer input is rejected before it reaches the lru_cache'd URL parser, so
+# clients can't pin arbitrarily large strings in every worker's memory
+MAX_VIDEO_URL_CHARS = 2048
+
+# Regexes used on every request, compiled once at import
+BARE_VIDEO_ID_RE = re.compile(r'[a-zA-Z0-9_-]{11}')
+URL_SCHEME_RE = re.compile(r'^https?://', re.IGNORECASE)
+# Fallback scan: an ID after a known URL marker, or a trailing 11-char ID
+FALLBACK_VIDEO_ID_RE = re.compile(
+    r"(?:v=|/videos/|embed/|youtu\.be/|/v/|/e/|watch\?v=)([a-zA-Z0-9_-]{11})|([a-zA-Z0-9_-]{11})$"
+)
+
+# Shared HTTP session carrying the browser User-Agent for watch-page scrapes.
+# Scrapes deliberately don't keep connections alive: they stop reading at
+# </head> and close the socket (see fetch_video_metadata), since draining the
+# rest of a ~1 MB page to return it to the pool costs more than the TCP + TLS
+# handshake it would save, and each video is scraped at most once a day.
+http_session = requests.Session()
+http_session.headers.update({
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+                  " AppleWebKit/537.36 (KHTML, like Gecko)"
+                  " Chrome/114.0 Safari/537.36"
+})
+
+# Metadata scrapes read the watch page only up to </head>, with a hard cap in
+# case the closing tag is missing.
+METADATA_READ_CHUNK_BYTES = 16 * 1024
+METADATA_MAX_BYTES = 256 * 1024
+
+# Gemini calls are network-bound, so chunk prompts are fanned out on a shared
+# pool. Module-level so the cap applies across concurrent requests too. Under
+# the Gunicorn gevent worker the patched threading module makes these workers
+# greenlets, so the fan-out costs no OS threads.
+MAX_GEMINI_WORKERS = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+gemini_executor = ThreadPoolExecutor(max_workers=MAX_GEMINI_WORKERS, thread_name_prefix='gemini')
+
+# The watch-page scrape runs here while the request thread fetches the
+# transcript, so extract-video-info waits on the slower of the two, not both.
+MAX_FETCH_WORKERS = int(os.getenv("YOUTUBE_MAX_CONCURRENCY", 8))
+fetch_executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS, thread_name_prefix='fetch')
+
+# Gemini context caching: a long transcript is uploaded once as cached content
+# and later chat turns send only history + question. Caching needs a pinned
+# model version and at least ~32k tokens of content. The cache is created on
+# a chat's second question, so one-question chats never pay for the upload.
+CONTEXT_CACHE_MODEL = 'models/gemini-1.5-flash-002'
+CONTEXT_CACHE_MIN_CHARS = 32768 * CHARS_PER_TOKEN
+CONTEXT_CACHE_TTL = datetime.timedelta(hours=1)
+# Local handles (and the cache names shared with other workers via the disk
+# cache) expire a few minutes before the server-side cache does
+CONTEXT_CACHE_LOCAL_TTL_SECONDS = int(CONTEXT_CACHE_TTL.total_seconds()) - 300
+context_cache_models: TTLCache = TTLCache(maxsize=256, ttl=CONTEXT_CACHE_LOCAL_TTL_SECONDS)
+context_cache_lock = threading.Lock()
+
+# Slow endpoints can run as background jobs (opt-in with ?async=1) that the
+# client polls via /api/job/<id>. Job state lives in the disk cache so any
+# worker process on the host can answer the poll. Kept separate from
+# gemini_executor: jobs submit to that pool and must not wait on themselves.
+#
+# Jobs are threads inside the web process, so they need a long-lived server
+# (Gunicorn via the Procfile, or the standalone gevent server). On Vercel the
+# function is frozen once the response is sent, so ?async=1 is ignored there
+# and the request runs synchronously; TALK2YT_BACKGROUND_JOBS=1/0 overrides.
+BACKGROUND_JOBS_ENABLED = os.getenv("TALK2YT_BACKGROUND_JOBS", "0" if os.getenv("VERCEL") else "1") == "1"
+MAX_JOB_WORKERS = int(os.getenv("MAX_JOB_WORKERS", 4))
+JOB_TTL_SECONDS = 3600
+# A job not finished by its deadline died with its worker (recycle, crash)
+# and is reported as failed instead of "running" until JOB_TTL_SECONDS.
+JOB_MAX_RUNTIME_SECONDS = int(os.getenv("JOB_MAX_RUNTIME_SECONDS", 900))
+job_executor = ThreadPoolExecutor(max_workers=MAX_JOB_WORKERS, thread_name_prefix='job')
+
+# In-process memo of Gemini answers keyed by a prompt digest
+GEMINI_RESPONSE_CACHE_SIZE = 1024
+gemini_response_cache: LRUCache = LRUCache(maxsize=GEMINI_RESPONSE_CACHE_SIZE)
+gemini_response_cache_lock = threading.Lock()
+
+# Semantic answer cache: per transcript, recent (query embedding, answer)
+# pairs. A new standalone question whose embedding is close enough to an
+# earlier one reuses that answer instead of calling Gemini.
+SEMANTIC_CACHE_THRESHOLD = 0.9
+SEMANTIC_CACHE_MAX_ANSWERS = 128  # per transcript, oldest evicted first
+SEMANTIC_CACHE_MAX_TRANSCRIPTS = 256
+semantic_answer_cache: LRUCache = LRUCache(maxsize=SEMANTIC_CACHE_MAX_TRANSCRIPTS)
+semantic_answer_cache_lock = threading.Lock()
+# Answers are embedded and stored off the response path on their own small
+# pool, so long ?async=1 jobs on job_executor can't hold cache writes back.
+semantic_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='semantic')
+
+# Formatted chat transcripts by transcript_key, so follow-up chat turns can
+# send the key instead of re-uploading the transcript. The in-process LRU
+# fronts the disk cache, which lets other worker processes resolve keys too.
+CHAT_TRANSCRIPT_CACHE_SIZE = 256
+CHAT_TRANSCRIPT_TTL_SECONDS = 24 * 3600
+# Larger transcripts get no key, so clients can't fill memory and disk with
+# arbitrary text; they keep sending it inline instead.
+CHAT_TRANSCRIPT_MAX_CHARS = 2_000_000
+chat_transcripts: LRUCache = LRUCache(maxsize=CHAT_TRANSCRIPT_CACHE_SIZE)
+chat_transcripts_lock = threading.Lock()
+
+# Chunk summaries are requested several at a time to amortize per-call overhead.
+# 4 x 6k-token chunks keeps a batch prompt well inside Gemini's context window.
+# This is an upper bound: batches only grow once there are more chunks than
+# Gemini workers, since a batch generates its summaries one after another.
+SUMMARY_BATCH_SIZE = 4
+SUMMARY_SEPARATOR = '<<<SEP>>>'
+
+# --- Prompts ---
+# Static instruction text is built once here; endpoints only concatenate the
+# per-request parts instead of re-formatting the whole template.
+
+CHAT_SYSTEM_INSTRUCTION = (
+    "You are Sanchar, an AI video assistant. Answer the user's question based ONLY on the video content below. "
+    "The transcript is formatted with timestamps like [HH:MM:SS].\n\n"
+    "REQUIREMENTS:\n"
+    "1) Begin your answer with the most relevant timestamp in [HH:MM:SS] format.\n"
+    "2) Keep your answer concise and factual.\n"
+    "3) If you cannot find an answer in the video, say so.\n"
+)
+CHAT_PROMPT_PREFIX = CHAT_SYSTEM_INSTRUCTION + "\n--- PREVIOUS CONVERSATION ---\n"
+# With a context cache the instructions and transcript live server-side
+CHAT_CACHED_PROMPT_PREFIX = "--- PREVIOUS CONVERSATION ---\n"
+CHAT_PROMPT_SUFFIX = "\n\nSanchar's Answer:"
+CHAT_FALLBACK_ANSWER = "I'm sorry, I couldn't find an answer to that in the video content."
+
+SUMMARY_FALLBACK_TEXT = "I could not generate a summary for this video."
+EMPTY_SUMMARY_TEXT = "There is no content to summarize."
+SYNTHESIS_PROMPT_PREFIX = (
+    "You are Sanchar, a helpful AI video assistant. "
+    "You will be given several summaries from consecutive parts of a single video. "
+    "Synthesize them into one coherent, structured response, merging points that "
+    "repeat across parts instead of listing them twice.\n\n"
+    "FORMAT:\n"
+    "1) Summary: a concise paragraph of the whole video.\n"
+    "2) Key Takeaways: a bulleted list of the most important points.\n\n"
+    "--- Individual Summaries ---\n"
+)
+
+CHUNK_SUMMARY_PROMPT_PREFIX = (
+    "Provide a detailed summary of the following video content segment. "
+    "Focus on key points, arguments, and conclusions.\n\n"
+    "---\n"
+)
 
 
 # --- Helper Functions ---
 
+def disk_cached(name: str, expire: int = CACHE_TTL_SECONDS):
+    """Memoize a function in the disk cache; a no-op if the cache is unavailable."""
+    def decorator(func):
+        if cache is None:
+            return func
+        return cache.memoize(name=name, expire=expire)(func)
+    return decorator
+
+
+def cache_forget(func, *args: Any) -> None:
+    """Drop a disk_cached function's stored result for these arguments."""
+    if cache is None or not hasattr(func, '__cache_key__'):
+        return
+    try:
+        cache.delete(func.__cache_key__(*args))
+    except Exception as e:
+        logger.warning("Disk cache delete failed for %s: %s", func.__name__, e)
+
+
+def cache_get(key: tuple) -> Any:
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.warning("Disk cache read failed for %s: %s", key[0], e)
+        return None
+
+
+def cache_set(key: tuple, value: Any, expire: int = CACHE_TTL_SECONDS) -> None:
+    if cache is None:
+        return
+    try:
+        cache.set(key, value, expire=expire)
+    except Exception as e:
+        logger.warning("Disk cache write failed for %s: %s", key[0], e)
+
+
+def cache_delete(key: tuple) -> None:
+    if cache is None:
+        return
+    try:
+        cache.delete(key)
+    except Exception as e:
+        logger.warning("Disk cache delete failed for %s: %s", key[0], e)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls by key: one caller runs the work, the rest share its outcome.
+
+    Nothing is kept once the call finishes; results are cached elsewhere.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, Future] = {}
+
+    def do(self, key: Any, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+# Identical Gemini prompts in flight at once (e.g. several users summarizing
+# the same trending video) share a single model call.
+gemini_flight = SingleFlight()
+# Likewise for YouTube: many users opening the same video on a cold cache
+# trigger one transcript fetch and one watch-page scrape, not one each.
+youtube_flight = SingleFlight()
+# Concurrent chat turns on one long transcript create one context cache.
+context_cache_flight = SingleFlight()
+
+
+def transcript_digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def make_transcript_key(formatted_transcript: str) -> str:
+    return hashlib.blake2b(formatted_transcript.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def remember_chat_transcript(formatted_transcript: str) -> Optional[str]:
+    """Store a formatted transcript for later chat turns and return its key.
+
+    Returns None, storing nothing, for text over CHAT_TRANSCRIPT_MAX_CHARS.
+    """
+    if len(formatted_transcript) > CHAT_TRANSCRIPT_MAX_CHARS:
+        return None
+    key = make_transcript_key(formatted_transcript)
+    with chat_transcripts_lock:
+        known = key in chat_transcripts
+        chat_transcripts[key] = formatted_transcript
+    if not known:
+        cache_set(('chat_transcript', key), formatted_transcript, expire=CHAT_TRANSCRIPT_TTL_SECONDS)
+    return key
+
+
+def lookup_chat_transcript(key: str) -> Optional[str]:
+    with chat_transcripts_lock:
+        text = chat_transcripts.get(key)
+    if text is None:
+        text = cache_get(('chat_transcript', key))
+        if text is not None:
+            with chat_transcripts_lock:
+                chat_transcripts[key] = text
+    return text
+
+
 def clean_ai_response(text: Any) -> str:
     """Remove unwanted formatting like markdown bolding and trim."""
     if not isinstance(text, str):
@@ -53,15 +463,25 @@ def extract_youtube_video_id(url: Any) -> Optional[str]:
     """Extract a YouTube video ID from many URL formats, or from a bare 11-char ID."""
     if not isinstance(url, str):
         return None
-    s = url.strip()
+    url = url.strip()
+    if len(url) > MAX_VIDEO_URL_CHARS:
+        return None
+    return parse_youtube_video_id(url)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_youtube_video_id(s: str) -> Optional[str]:
+    """Memoized parser behind extract_youtube_video_id; `s` is an already-stripped str."""
     # Bare ID
-    if re.fullmatch(r'[a-zA-Z0-9_-]{11}', s):
+    if BARE_VIDEO_ID_RE.fullmatch(s):
         return s
+    # Anything else must at least mention a YouTube host; skip parsing otherwise
+    if 'youtu' not in s.lower():
+        return None
     try:
         # Normalize to have a scheme so urlparse behaves
-        if not re.match(r'^https?://', s, re.IGNORECASE):
+        if not URL_SCHEME_RE.match(s):
             s = 'https://' + s
-        from urllib.parse import urlparse, parse_qs
         u = urlparse(s)
         host = (u.hostname or '').lower().replace('www.', '')
         vid = None
@@ -77,82 +497,233 @@ def extract_youtube_video_id(url: Any) -> Optional[str]:
                 vid = u.path.split('/shorts/')[1].split('/')[0]
         elif host == 'youtu.be':
             vid = (u.path or '').lstrip('/').split('/')[0]
-        if vid and re.fullmatch(r'[a-zA-Z0-9_-]{11}', vid):
+        if vid and BARE_VIDEO_ID_RE.fullmatch(vid):
             return vid
     except Exception:
         pass
 
     # Regex fallback
-    regexes = [
-        r"(?:v=|/videos/|embed\/|youtu\.be\/|\/v\/|\/e\/|watch\?v=|v=)([a-zA-Z0-9_-]{11})",
-        r"([a-zA-Z0-9_-]{11})$"
-    ]
-    for rgx in regexes:
-        m = re.search(rgx, url)
-        if m:
-            return m.group(1)
+    m = FALLBACK_VIDEO_ID_RE.search(s)
+    if m:
+        return m.group(1) or m.group(2)
     return None
 
 
 def format_timestamp(seconds: float) -> str:
     """Converts seconds to [HH:MM:SS] format."""
     try:
-        seconds = float(seconds)
+        whole_seconds = max(0, int(float(seconds)))
     except Exception:
-        seconds = 0.0
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    return f"[{hours:02}:{minutes:02}:{secs:02}]"
+        whole_seconds = 0
+    return format_whole_seconds(whole_seconds)
+
+
+@functools.lru_cache(maxsize=8192)
+def format_whole_seconds(total: int) -> str:
+    # Keyed on whole seconds so every caption starting within the same second shares an entry
+    minutes, secs = divmod(total, 60)
+    hours, minutes = divmod(minutes, 60)
+    return "[%02d:%02d:%02d]" % (hours, minutes, secs)
+
+
+def format_transcript_list(transcript_list: List[Dict[str, Any]]) -> str:
+    """Flatten a transcript list into "[HH:MM:SS] text" entries for the chat prompt."""
+    # Bound locals: this runs once per caption, tens of thousands of times for long videos
+    fmt = format_timestamp
+    pieces: List[str] = []
+    append = pieces.append
+    for item in transcript_list:
+        append(fmt(item.get('start', 0)) + " " + item.get('text', ''))
+    return " ".join(pieces)
+
+
+def get_og_tags(tree: LexborHTMLParser) -> Dict[str, str]:
+    """Collect every og:* meta tag in one selector pass; the first occurrence wins."""
+    tags: Dict[str, str] = {}
+    for node in tree.css('meta[property^="og:"]'):
+        attrs = node.attributes
+        content = attrs.get('content')
+        if content:
+            tags.setdefault(attrs.get('property'), content)
+    return tags
+
+
+@disk_cached('video_metadata', expire=METADATA_TTL_SECONDS)
+def fetch_video_metadata(video_id: str) -> (str, str):
+    """Scrape title/description from the watch page's OG tags. Raises on HTTP errors."""
+    page_url = f"https://www.youtube.com/watch?v={video_id}"
+    logger.info("Attempting to scrape metadata from: %s", page_url)
+    # The OG tags live in <head>; stop reading once it closes instead of
+    # downloading the whole (~1 MB) watch page. Leaving the block with the body
+    # unread closes the connection rather than returning it to the pool.
+    head = bytearray()
+    with http_session.get(page_url, timeout=10, stream=True) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(METADATA_READ_CHUNK_BYTES):
+            head += chunk
+            if head.find(b'</head>', max(0, len(head) - len(chunk) - 7)) != -1:
+                break
+            if len(head) >= METADATA_MAX_BYTES:
+                break
+    # Raw bytes: lexbor decodes UTF-8 and HTML entities itself
+    tree = LexborHTMLParser(bytes(head))
+    og = get_og_tags(tree)
+    title = og.get('og:title') or "Unknown Title"
+    description = og.get('og:description') or "No Description Available"
+    return title, description
+
+
+@disk_cached('transcript', expire=TRANSCRIPT_TTL_SECONDS)
+def fetch_transcript(video_id: str) -> List[Dict[str, Any]]:
+    """Fetch the English transcript list. Lookup errors propagate and are not cached."""
+    return YouTubeTranscriptApi.get_transcript(video_id, languages=['en', 'en-US', 'en-GB'])
 
 
 def get_video_metadata_from_webpage(video_id: str) -> (str, str):
     """Lightweight scrape of title/description using OG tags."""
     try:
-        page_url = f"https://www.youtube.com/watch?v={video_id}"
-        logging.info(f"Attempting to scrape metadata from: {page_url}")
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-                          " AppleWebKit/537.36 (KHTML, like Gecko)"
-                          " Chrome/114.0 Safari/537.36"
-        }
-        resp = requests.get(page_url, timeout=10, headers=headers)
-        resp.raise_for_status()
-        html = resp.text
-        title_match = re.search(r'<meta property="og:title" content="([^"]*)"', html)
-        desc_match = re.search(r'<meta property="og:description" content="([^"]*)"', html)
-        title = title_match.group(1) if title_match else "Unknown Title"
-        description = desc_match.group(1) if desc_match else "No Description Available"
-        return title, description
+        return youtube_flight.do(('metadata', video_id), fetch_video_metadata, video_id)
     except Exception as e:
-        logging.error(f"Error fetching video metadata for {video_id}: {e}")
+        logger.error("Error fetching video metadata for %s: %s", video_id, e)
         return "Error fetching title", "Error fetching description"
 
 
-def get_transcript_chunks(transcript_text: str, max_chars: int, overlap_chars: int) -> List[str]:
-    """Chunk a long transcript to help with summarization."""
+def count_transcript_chunks(text_length: int, max_chars: int, overlap_chars: int) -> int:
+    """Number of chunks get_transcript_chunks yields for a text of this length."""
+    if text_length <= 0:
+        return 0
+    step = max_chars - overlap_chars
+    return max(1, -(-(text_length - overlap_chars) // step))
+
+
+def get_transcript_chunks(transcript_text: str, max_chars: int, overlap_chars: int) -> Iterator[str]:
+    """Lazily chunk a long transcript to help with summarization.
+
+    A trailing chunk that would only repeat the previous chunk's overlap is skipped.
+    """
     if not transcript_text:
-        return []
-    chunks: List[str] = []
-    pos = 0
-    n = len(transcript_text)
-    while pos < n:
-        end = min(pos + max_chars, n)
-        chunks.append(transcript_text[pos:end])
-        pos += max_chars - overlap_chars
-        if pos >= n:
-            break
-    logging.info(f"Transcript chunked into {len(chunks)} parts.")
-    return chunks
-
-
-def call_gemini(prompt: str) -> str:
-    """Robust wrapper around Gemini call that returns text or empty string."""
-    if model is None:
-        logging.error("Gemini model is not initialized.")
+        return
+    step = max_chars - overlap_chars
+    for start in range(0, max(len(transcript_text) - overlap_chars, 1), step):
+        yield transcript_text[start:start + max_chars]
+
+
+def iter_batches(items: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def prompt_key(prompt: str, gemini_model: Any = None) -> str:
+    # blake2b is faster than sha256 and 16 bytes is plenty for a cache key.
+    # Prompts sent against a context cache are scoped by the cache's name.
+    scope = getattr(gemini_model, 'cached_content', None) or ''
+    return hashlib.blake2b((scope + '\0' + prompt).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def call_gemini(prompt: str, gemini_model: Any = None) -> str:
+    """Robust wrapper around Gemini call that returns text or empty string.
+
+    Non-empty responses are memoized per prompt, so repeated identical
+    requests (refreshes, demo questions) skip the model round-trip, and
+    identical prompts already in flight wait for that call instead of
+    sending their own.
+    `gemini_model` overrides the default model, e.g. one bound to a context cache.
+    """
+    gemini_model = gemini_model or model
+    if gemini_model is None:
+        logger.error("Gemini model is not initialized.")
         return ""
+    key = prompt_key(prompt, gemini_model)
+    with gemini_response_cache_lock:
+        cached = gemini_response_cache.get(key)
+    if cached is not None:
+        logger.info("Gemini response served from cache.")
+        return cached
+    return gemini_flight.do(key, generate_and_memoize, key, prompt, gemini_model)
+
+
+def generate_and_memoize(key: str, prompt: str, gemini_model: Any) -> str:
+    text = generate_gemini_text(prompt, gemini_model)
+    if text:
+        with gemini_response_cache_lock:
+            gemini_response_cache[key] = text
+    return text
+
+
+class GeminiStreamError(Exception):
+    """A streamed Gemini generation failed or stopped before completing."""
+
+
+# A generation that ends for any other reason (safety, recitation, ...) is cut off
+COMPLETE_FINISH_REASONS = {'FINISH_REASON_UNSPECIFIED', 'STOP', 'MAX_TOKENS'}
+
+
+def stream_chunk_stop_reason(chunk: Any) -> Optional[str]:
+    """Why a streamed chunk ends the generation early, or None if it doesn't."""
+    feedback = getattr(chunk, 'prompt_feedback', None)
+    block_reason = getattr(feedback, 'block_reason', None)
+    if block_reason:
+        return f"prompt blocked ({getattr(block_reason, 'name', block_reason)})"
+    for candidate in getattr(chunk, 'candidates', None) or ():
+        finish_reason = getattr(candidate, 'finish_reason', None)
+        name = getattr(finish_reason, 'name', None)
+        if name is not None and name not in COMPLETE_FINISH_REASONS:
+            return f"finish reason {name}"
+    return None
+
+
+def stream_gemini(prompt: str, gemini_model: Any = None) -> Iterator[str]:
+    """Yield response text as Gemini generates it; a memoized answer is yielded whole.
+
+    The full text is memoized like call_gemini once the stream completes.
+    Yields nothing if the model is unavailable. Raises GeminiStreamError if the
+    call fails or the generation stops early, after whatever text was already
+    yielded; nothing is memoized then.
+    """
+    gemini_model = gemini_model or model
+    if gemini_model is None:
+        logger.error("Gemini model is not initialized.")
+        return
+    key = prompt_key(prompt, gemini_model)
+    with gemini_response_cache_lock:
+        cached = gemini_response_cache.get(key)
+    if cached is not None:
+        logger.info("Gemini response served from cache.")
+        yield cached
+        return
+    pieces: List[str] = []
     try:
-        resp = model.generate_content(prompt)
+        for chunk in gemini_model.generate_content(prompt, stream=True):
+            stop_reason = stream_chunk_stop_reason(chunk)
+            if stop_reason:
+                raise GeminiStreamError(f"Gemini stream stopped early: {stop_reason}")
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. the trailing finish chunk)
+                continue
+            if text:
+                pieces.append(text)
+                yield text
+    except GeminiStreamError as e:
+        logger.error("%s", e)
+        raise
+    except Exception as e:
+        logger.error("Gemini streaming call failed: %s", e, exc_info=True)
+        raise GeminiStreamError(str(e)) from e
+    if pieces:
+        with gemini_response_cache_lock:
+            gemini_response_cache[key] = "".join(pieces)
+
+
+def generate_gemini_text(prompt: str, gemini_model: Any) -> str:
+    """Uncached Gemini call; returns the response text or empty string."""
+    try:
+        resp = gemini_model.generate_content(prompt)
         # Try common ways to get text
         if getattr(resp, "text", None):
             return str(resp.text)
@@ -162,56 +733,521 @@ def call_gemini(prompt: str) -> str:
             return str(cand[0].content.parts[0].text or "")
         return ""
     except Exception as e:
-        logging.error(f"Gemini call failed: {e}", exc_info=True)
+        logger.error("Gemini call failed: %s", e, exc_info=True)
         return ""
 
 
-# --- API Endpoints ---
+def get_context_cached_model(formatted_transcript: str, create: bool = True) -> Any:
+    """A model bound to a Gemini context cache holding this transcript, or None.
 
-@app.route('/api/extract-video-info', methods=['POST'])
-def extract_video_info():
-    data = request.get_json(silent=True) or {}
-    video_url = data.get('video_url')
-    if not video_url:
-        return jsonify({"error": "Video URL is required"}), 400
+    Only transcripts long enough to qualify are cached. An existing cache is
+    reused (this worker's handle, or another worker's by name from the disk
+    cache); a new one is only made when `create` is set. A failed creation is
+    remembered too, so later turns go straight to the inline-prompt path.
+    """
+    if model is None or len(formatted_transcript) < CONTEXT_CACHE_MIN_CHARS:
+        return None
+    key = transcript_digest(formatted_transcript)
+    with context_cache_lock:
+        cached_model = context_cache_models.get(key)
+    if cached_model is not None:
+        return cached_model or None
+    if cache_get(('context_cache', key)) is None and not create:
+        return None
+    return context_cache_flight.do(key, load_context_cached_model, key, formatted_transcript)
 
-    video_id = extract_youtube_video_id(video_url)
-    if not video_id:
-        return jsonify({"error": "Invalid YouTube URL"}), 400
 
-    title, description = get_video_metadata_from_webpage(video_id)
+def load_context_cached_model(key: str, formatted_transcript: str) -> Any:
+    """Open the transcript's context cache by its shared name, or create it."""
+    cached_model = None
+    name = cache_get(('context_cache', key))
+    if name:
+        try:
+            cached_model = genai.GenerativeModel.from_cached_content(caching.CachedContent.get(name))
+        except Exception as e:
+            logger.warning("Context cache %s is gone, creating a new one: %s", name, e)
+            cache_delete(('context_cache', key))
+    if cached_model is None:
+        try:
+            cached_content = caching.CachedContent.create(
+                model=CONTEXT_CACHE_MODEL,
+                display_name=f"talk2yt-{key[:16]}",
+                system_instruction=CHAT_SYSTEM_INSTRUCTION,
+                contents=["--- VIDEO CONTENT ---\n" + formatted_transcript + "\n---"],
+                ttl=CONTEXT_CACHE_TTL,
+            )
+            cached_model = genai.GenerativeModel.from_cached_content(cached_content)
+            cache_set(('context_cache', key), cached_content.name, expire=CONTEXT_CACHE_LOCAL_TTL_SECONDS)
+            logger.info("Created Gemini context cache %s for transcript %s", cached_content.name, key[:16])
+        except Exception as e:
+            logger.warning("Context cache creation failed, sending transcript inline: %s", e)
+            cached_model = False
+    with context_cache_lock:
+        context_cache_models[key] = cached_model
+    return cached_model or None
+
+
+def embed_texts(texts: List[str], task_type: str) -> List[List[float]]:
+    """Embed texts with the Gemini embedding model, batching as the API requires."""
+    vectors: List[List[float]] = []
+    for batch in iter_batches(texts, EMBED_BATCH_SIZE):
+        result = genai.embed_content(model=EMBEDDING_MODEL, content=batch, task_type=task_type)
+        vectors.extend(result['embedding'])
+    return vectors
+
+
+@functools.lru_cache(maxsize=1024)
+def embed_query(text: str) -> Tuple[float, ...]:
+    """Query embedding, shared by chunk retrieval and the semantic answer cache."""
+    return tuple(embed_texts([text], 'retrieval_query')[0])
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def get_chunk_embeddings(chunks: List[str], transcript: str) -> Optional[List[List[float]]]:
+    """Embeddings for a transcript's chunks, computed once per transcript and kept on disk.
+
+    None if embedding failed. The failure is cached as False for
+    EMBEDDING_FAILURE_TTL_SECONDS, so later turns skip straight to the full text.
+    """
+    key = ('chunk_embeddings', transcript_digest(transcript))
+    embeddings = cache_get(key)
+    if embeddings is False:
+        return None
+    if embeddings is None or len(embeddings) != len(chunks):
+        try:
+            embeddings = embed_texts(chunks, 'retrieval_document')
+        except Exception as e:
+            logger.warning("Chunk embedding failed, not retrying for %ds: %s", EMBEDDING_FAILURE_TTL_SECONDS, e)
+            cache_set(key, False, expire=EMBEDDING_FAILURE_TTL_SECONDS)
+            return None
+        cache_set(key, embeddings)
+    return embeddings
+
+
+def select_relevant_transcript(formatted_transcript: str, user_query: str) -> str:
+    """Return only the top-K chunks most similar to the query for long transcripts.
+
+    Short transcripts, and any embedding failure, fall back to the whole text.
+    """
+    if len(formatted_transcript) < CHAT_RETRIEVAL_MIN_CHARS or not GEMINI_API_KEY:
+        return formatted_transcript
+    chunks = list(get_transcript_chunks(formatted_transcript, RETRIEVAL_CHUNK_CHARS, OVERLAP_CHARS))
+    embeddings = get_chunk_embeddings(chunks, formatted_transcript)
+    if embeddings is None:
+        return formatted_transcript
+    try:
+        query_vector = embed_query(user_query)
+    except Exception as e:
+        logger.warning("Chunk retrieval failed, sending full transcript: %s", e)
+        return formatted_transcript
+    scores = [cosine_similarity(query_vector, emb) for emb in embeddings]
+    top = sorted(range(len(chunks)), key=scores.__getitem__, reverse=True)[:CHAT_RETRIEVAL_TOP_K]
+    logger.info("Retrieved chunks %s of %d for chat query.", sorted(top), len(chunks))
+    # Keep transcript order so the timestamps read chronologically
+    return "\n...\n".join(chunks[i] for i in sorted(top))
+
+
+def is_standalone_question(conversation_history: Any) -> bool:
+    """True if no earlier user turn exists, so the answer can't depend on chat context."""
+    if not isinstance(conversation_history, list):
+        return True
+    return not any(isinstance(item, dict) and item.get('role') == 'user' for item in conversation_history)
+
+
+def find_similar_answer(transcript_key: str, user_query: str) -> Optional[str]:
+    """A cached answer to a near-duplicate question about the same transcript, if any."""
+    with semantic_answer_cache_lock:
+        entries = list(semantic_answer_cache.get(transcript_key) or ())
+    if not entries or not GEMINI_API_KEY:
+        return None
+    try:
+        query_vector = embed_query(user_query)
+    except Exception as e:
+        logger.warning("Query embedding failed, skipping semantic cache: %s", e)
+        return None
+    score, answer = max(((cosine_similarity(query_vector, vec), ans) for vec, ans in entries), key=itemgetter(0))
+    if score >= SEMANTIC_CACHE_THRESHOLD:
+        logger.info("Semantic cache hit (similarity %.3f).", score)
+        return answer
+    return None
+
+
+def remember_answer(transcript_key: str, user_query: str, answer: str) -> None:
+    if not GEMINI_API_KEY or answer == CHAT_FALLBACK_ANSWER:
+        return
+    try:
+        query_vector = embed_query(user_query)
+    except Exception as e:
+        logger.warning("Query embedding failed, answer not cached: %s", e)
+        return
+    with semantic_answer_cache_lock:
+        entries = semantic_answer_cache.get(transcript_key)
+        if entries is None:
+            entries = deque(maxlen=SEMANTIC_CACHE_MAX_ANSWERS)
+            semantic_answer_cache[transcript_key] = entries
+        entries.append((query_vector, answer))
+
+
+def build_chunk_summary_prompt(chunk: str) -> str:
+    return CHUNK_SUMMARY_PROMPT_PREFIX + chunk + "\n---"
+
+
+def summarize_batch(chunks: List[str]) -> List[str]:
+    """Summarize several chunks with one Gemini call, falling back to one call per chunk."""
+    if len(chunks) == 1:
+        return [call_gemini(build_chunk_summary_prompt(chunks[0]))]
+    n = len(chunks)
+    segments = "\n".join(f"=== SEGMENT {i} ===\n{chunk}" for i, chunk in enumerate(chunks, 1))
+    prompt = (
+        f"Summarize each of the following {n} video content segments separately. "
+        "Focus on key points, arguments, and conclusions. "
+        f"Return exactly {n} summaries, in order, separated by a line containing only '{SUMMARY_SEPARATOR}'. "
+        "Do not add segment headings.\n\n"
+        f"{segments}"
+    )
+    parts = [p.strip() for p in call_gemini(prompt).split(SUMMARY_SEPARATOR)]
+    parts = [p for p in parts if p]
+    if len(parts) == n:
+        return parts
+    logger.warning("Batched summary returned %d parts for %d segments; retrying per chunk.", len(parts), n)
+    return [call_gemini(build_chunk_summary_prompt(chunk)) for chunk in chunks]
+
+
+def batched_summarize(chunks: Iterable[str], batch_size: int = SUMMARY_BATCH_SIZE) -> List[str]:
+    """Summarize chunks in batches of `batch_size`, running the batches concurrently.
+
+    At most MAX_GEMINI_WORKERS batches are in flight; the next batch is only
+    cut from `chunks` once the oldest one finishes, so a long transcript is
+    never materialized as chunks all at once.
+
+    Returns one summary per chunk, in chunk order; a chunk whose Gemini call
+    failed gets an empty string, so callers can tell the result is incomplete.
+    """
+    summaries: List[str] = []
+    in_flight: Deque[Future] = deque()
+    for batch in iter_batches(chunks, batch_size):
+        if len(in_flight) >= MAX_GEMINI_WORKERS:
+            summaries.extend(in_flight.popleft().result())
+        in_flight.append(gemini_executor.submit(summarize_batch, batch))
+    while in_flight:
+        summaries.extend(in_flight.popleft().result())
+    return summaries
+
+
+def build_video_info(video_id: str, force: bool = False,
+                     include_transcript_list: bool = False) -> Tuple[Dict[str, Any], int]:
+    """Metadata, the flat and formatted transcript and a chat transcript_key, with an HTTP status.
+
+    `force` discards cached metadata and transcript first, re-fetching both.
+    The raw timed transcript list is only included on request.
+    """
+    if force:
+        logger.info("Forced refresh of cached data for %s", video_id)
+        cache_forget(fetch_video_metadata, video_id)
+        cache_forget(fetch_transcript, video_id)
+    # Scrape metadata in the background while the transcript is fetched here
+    metadata_future = fetch_executor.submit(get_video_metadata_from_webpage, video_id)
 
     # Get both raw list and flat text
     transcript_text = ""
     transcript_list: List[Dict[str, Any]] = []
     try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en', 'en-US', 'en-GB'])
-        transcript_text = " ".join([entry.get('text', '') for entry in transcript_list])
-        logging.info(f"Transcript extracted for {video_id}. Length: {len(transcript_text)} chars. Items: {len(transcript_list)}")
+        transcript_list = youtube_flight.do(('transcript', video_id), fetch_transcript, video_id)
+        # map + itemgetter runs in C and skips the intermediate list
+        transcript_text = " ".join(map(itemgetter('text'), transcript_list))
+        # Formatted once here so chat turns don't redo it for every question
+        formatted_transcript = format_transcript_list(transcript_list)
+        logger.info("Transcript extracted for %s. Length: %d chars. Items: %d", video_id, len(transcript_text), len(transcript_list))
     except NoTranscriptFound:
-        return jsonify({"error": "A transcript could not be found for this video."}), 404
+        return {"error": "A transcript could not be found for this video."}, 404
     except TranscriptsDisabled:
-        return jsonify({"error": "Transcripts are disabled for this video."}), 403
+        return {"error": "Transcripts are disabled for this video."}, 403
     except Exception as e:
-        logging.error(f"Unexpected error getting transcript for {video_id}: {e}", exc_info=True)
-        return jsonify({"error": f"An unexpected error occurred while fetching the transcript: {str(e)}"}), 500
+        logger.error("Unexpected error getting transcript for %s: %s", video_id, e, exc_info=True)
+        return {"error": f"An unexpected error occurred while fetching the transcript: {str(e)}"}, 500
 
-    return jsonify({
+    # Never raises: scrape errors become placeholder strings
+    title, description = metadata_future.result()
+    payload = {
         "videoId": video_id,
         "title": title,
         "description": description,
         "transcript": transcript_text,
-        "transcript_list": transcript_list,  # <-- ADDED for precise timestamps
-    })
+        "formatted_transcript": formatted_transcript,
+        # Lets the first chat turn skip uploading the transcript
+        "transcript_key": remember_chat_transcript(formatted_transcript),
+    }
+    if include_transcript_list:
+        payload["transcript_list"] = transcript_list
+    return payload, 200
+
+
+def measure_chars_per_token(text: str) -> float:
+    """Characters per Gemini token for this text, cached per transcript.
+
+    Measured on the first TOKEN_COUNT_SAMPLE_CHARS characters. Falls back to
+    CHARS_PER_TOKEN when the model is unavailable or counting fails; a failure
+    is cached for TOKEN_COUNT_FAILURE_TTL_SECONDS so it isn't retried per request.
+    """
+    cache_key = ('chars_per_token', transcript_digest(text))
+    cached_ratio = cache_get(cache_key)
+    if cached_ratio:
+        return cached_ratio
+    if model is None:
+        return CHARS_PER_TOKEN
+    sample = text[:TOKEN_COUNT_SAMPLE_CHARS]
+    try:
+        total_tokens = model.count_tokens(sample).total_tokens
+    except Exception as e:
+        logger.warning("Token count failed, using %d chars/token: %s", CHARS_PER_TOKEN, e)
+        total_tokens = 0
+    if not total_tokens:
+        cache_set(cache_key, CHARS_PER_TOKEN, expire=TOKEN_COUNT_FAILURE_TTL_SECONDS)
+        return CHARS_PER_TOKEN
+    ratio = min(MAX_CHARS_PER_TOKEN, max(MIN_CHARS_PER_TOKEN, len(sample) / total_tokens))
+    logger.info("Measured %.2f chars/token over %d tokens.", ratio, total_tokens)
+    cache_set(cache_key, ratio)
+    return ratio
+
+
+def chunk_chars_for(text: str) -> int:
+    """Chunk size in characters that holds about MAX_CHUNK_TOKENS of this text.
+
+    Text that fits one chunk at the default ratio isn't measured, which saves
+    the token-count round-trip for short videos.
+    """
+    if len(text) <= MAX_TRANSCRIPT_LENGTH_CHARS:
+        return MAX_TRANSCRIPT_LENGTH_CHARS
+    return int(MAX_CHUNK_TOKENS * measure_chars_per_token(text))
+
+
+def summarize_chunks(video_transcript: str) -> List[str]:
+    """Step 1 of a summary: one summary per chunk in transcript order, "" where it failed."""
+    chunk_chars = chunk_chars_for(video_transcript)
+    # No overlap here: each chunk is summarized on its own and the synthesis
+    # step stitches them, so overlap would only be summarized (and paid for) twice.
+    n_chunks = count_transcript_chunks(len(video_transcript), chunk_chars, SUMMARY_OVERLAP_CHARS)
+    logger.info("Transcript chunked into %d parts of up to %d chars.", n_chunks, chunk_chars)
+    transcript_chunks = get_transcript_chunks(video_transcript, chunk_chars, SUMMARY_OVERLAP_CHARS)
+    # Batches of chunks, one Gemini call per batch. Use the smallest batches
+    # that still fit every batch on the pool at once.
+    batch_size = min(SUMMARY_BATCH_SIZE, -(-n_chunks // MAX_GEMINI_WORKERS))
+    return batched_summarize(transcript_chunks, batch_size)
+
+
+def build_synthesis_prompt(summaries: List[str]) -> str:
+    combined = "\n\n---\n\n".join(summaries)
+    return SYNTHESIS_PROMPT_PREFIX + combined + "\n\n--- Final Synthesized Response ---"
+
+
+def build_summary(video_transcript: str) -> Tuple[Dict[str, Any], int]:
+    """Two-step (chunk, then synthesize) summary of a transcript, with an HTTP status."""
+    cache_key = ('summary', transcript_digest(video_transcript))
+    cached_summary = cache_get(cache_key)
+    if cached_summary:
+        logger.info("Returning cached summary.")
+        return {"summary": cached_summary}, 200
+
+    if not video_transcript:
+        return {"summary": EMPTY_SUMMARY_TEXT}, 200
+
+    try:
+        # Step 1: Summarize chunks. A summary missing any chunk is still
+        # returned, flagged partial, but never cached as the video's summary.
+        chunk_summaries = summarize_chunks(video_transcript)
+        summaries = [s for s in chunk_summaries if s]
+        complete = len(summaries) == len(chunk_summaries)
+        if not complete:
+            logger.warning("%d of %d chunk summaries failed; summary will not be cached.",
+                           len(chunk_summaries) - len(summaries), len(chunk_summaries))
+
+        # Step 2: Synthesize
+        if len(summaries) > 1:
+            logger.info("Creating a final meta-summary from all chunk summaries.")
+            final_summary_text = call_gemini(build_synthesis_prompt(summaries))
+        else:
+            final_summary_text = summaries[0] if summaries else ""
+
+        cleaned = clean_ai_response(final_summary_text)
+        if not cleaned:
+            return {"summary": SUMMARY_FALLBACK_TEXT}, 200
+        logger.info("Generated final summary (first 150): %s...", cleaned[:150])
+        if not complete:
+            return {"summary": cleaned, "partial": True}, 200
+        cache_set(cache_key, cleaned)
+        return {"summary": cleaned}, 200
+
+    except Exception as e:
+        logger.error("Unexpected error during summarization: %s", e, exc_info=True)
+        return {"error": "An unexpected error occurred while generating the summary."}, 500
+
+
+# --- Streaming (Server-Sent Events) ---
+
+def wants_stream(data: Dict[str, Any]) -> bool:
+    """True if the client asked for an SSE stream instead of a single JSON reply."""
+    return data.get('stream') is True or 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def sse_event(payload: Dict[str, Any]) -> str:
+    # JSON-encoded so newlines in the model output can't break SSE framing
+    return "data: " + orjson.dumps(payload).decode('utf-8') + "\n\n"
+
+
+def sse_response(events: Iterator[str]) -> Response:
+    # X-Accel-Buffering stops nginx-style proxies from holding events back
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def stream_chat_answer(prompt: str, on_answer: Optional[Callable[[str], None]] = None,
+                       gemini_model: Any = None, done_fields: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """SSE events for a chat answer: {"delta": ...} per piece, then one final
+    {"done": true, "response": ...} carrying the cleaned full answer.
+
+    If the generation fails or is cut off, the stream ends with an {"error": ...}
+    event instead of "done". `on_answer` is called with the full answer only
+    once the stream completes. `done_fields` are merged into the final event.
+    """
+    pieces: List[str] = []
+    try:
+        for text in stream_gemini(prompt, gemini_model):
+            pieces.append(text)
+            yield sse_event({"delta": text.replace('**', '')})
+    except GeminiStreamError:
+        yield sse_event({"error": "An unexpected error occurred."})
+        return
+    answer = clean_ai_response("".join(pieces)) or CHAT_FALLBACK_ANSWER
+    logger.info("Streamed Gemini response (first 120): %s...", answer[:120])
+    if on_answer:
+        on_answer(answer)
+    yield sse_event({"done": True, "response": answer, **(done_fields or {})})
+
+
+def stream_summary(video_transcript: str) -> Iterator[str]:
+    """SSE events for a summary: chunk summaries run first, then the synthesis
+    streams as {"delta": ...} events, ending with {"done": true, "summary": ...}.
+
+    Failures, including a synthesis stream that is cut off partway, end the
+    stream with a single {"error": ...} event and leave nothing cached. A
+    summary missing any chunk is sent with "partial": true and not cached,
+    as in build_summary.
+    """
+    cache_key = ('summary', transcript_digest(video_transcript))
+    cached_summary = cache_get(cache_key)
+    if cached_summary:
+        logger.info("Returning cached summary.")
+        yield sse_event({"delta": cached_summary})
+        yield sse_event({"done": True, "summary": cached_summary})
+        return
+    try:
+        chunk_summaries = summarize_chunks(video_transcript)
+        summaries = [s for s in chunk_summaries if s]
+        complete = len(summaries) == len(chunk_summaries)
+        if not complete:
+            logger.warning("%d of %d chunk summaries failed; summary will not be cached.",
+                           len(chunk_summaries) - len(summaries), len(chunk_summaries))
+        if len(summaries) > 1:
+            logger.info("Streaming a final meta-summary from all chunk summaries.")
+            pieces: List[str] = []
+            for text in stream_gemini(build_synthesis_prompt(summaries)):
+                pieces.append(text)
+                yield sse_event({"delta": text.replace('**', '')})
+            cleaned = clean_ai_response("".join(pieces))
+        else:
+            cleaned = clean_ai_response(summaries[0] if summaries else "")
+            if cleaned:
+                yield sse_event({"delta": cleaned})
+    except GeminiStreamError:
+        # Already logged; the partial synthesis must not become the cached summary
+        yield sse_event({"error": "An unexpected error occurred while generating the summary."})
+        return
+    except Exception as e:
+        logger.error("Unexpected error during streamed summarization: %s", e, exc_info=True)
+        yield sse_event({"error": "An unexpected error occurred while generating the summary."})
+        return
+    if not cleaned:
+        yield sse_event({"done": True, "summary": SUMMARY_FALLBACK_TEXT})
+    elif not complete:
+        yield sse_event({"done": True, "summary": cleaned, "partial": True})
+    else:
+        cache_set(cache_key, cleaned)
+        yield sse_event({"done": True, "summary": cleaned})
+
+
+# --- Background Jobs ---
+
+def wants_background_job(data: Dict[str, Any]) -> bool:
+    """True if the client opted into async mode and this deployment can run jobs.
+
+    Needs a long-lived worker (see BACKGROUND_JOBS_ENABLED) and the shared disk
+    cache for job state; otherwise the request is served synchronously.
+    """
+    requested = request.args.get('async') == '1' or data.get('async') is True
+    return requested and BACKGROUND_JOBS_ENABLED and cache is not None
+
+
+def run_job(job_id: str, deadline: float, func, *args: Any) -> None:
+    cache_set(('job', job_id), {"status": "running", "deadline": deadline}, expire=JOB_TTL_SECONDS)
+    try:
+        payload, status_code = func(*args)
+    except Exception as e:
+        logger.error("Background job %s failed: %s", job_id, e, exc_info=True)
+        payload, status_code = {"error": "An unexpected error occurred."}, 500
+    cache_set(('job', job_id), {"status": "finished", "status_code": status_code, "result": payload},
+              expire=JOB_TTL_SECONDS)
+
+
+def submit_job(func, *args: Any):
+    """Queue `func(*args)` on the job pool and return a 202 with the job id to poll."""
+    job_id = uuid.uuid4().hex
+    deadline = time.time() + JOB_MAX_RUNTIME_SECONDS
+    cache_set(('job', job_id), {"status": "queued", "deadline": deadline}, expire=JOB_TTL_SECONDS)
+    job_executor.submit(run_job, job_id, deadline, func, *args)
+    logger.info("Queued background job %s (%s)", job_id, func.__name__)
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+
+# --- API Endpoints ---
+
+@app.route('/api/extract-video-info', methods=['POST'])
+def extract_video_info():
+    data = request.get_json(silent=True) or {}
+    video_url = data.get('video_url')
+    if not video_url:
+        return jsonify({"error": "Video URL is required"}), 400
+
+    video_id = extract_youtube_video_id(video_url)
+    if not video_id:
+        return jsonify({"error": "Invalid YouTube URL"}), 400
+
+    force = request.args.get('force') == '1' or data.get('force') is True
+    include_transcript_list = (request.args.get('include_transcript_list') == '1'
+                               or data.get('include_transcript_list') is True)
+    if wants_background_job(data):
+        return submit_job(build_video_info, video_id, force, include_transcript_list)
+    payload, status_code = build_video_info(video_id, force, include_transcript_list)
+    return jsonify(payload), status_code
 
 
 @app.route('/api/chat-with-video', methods=['POST'])
 def chat_with_video():
     """
     Unified endpoint:
-    - Preferred: 'video_transcript_list' (raw list with timestamps)
+    - Preferred: 'formatted_transcript' (as returned by /api/extract-video-info)
+    - Next:      'video_transcript_list' (raw list with timestamps)
     - Fallback:  'video_transcript' (flat string)
+    - Or:        'transcript_key' (returned by extract-video-info or an earlier
+                 turn) in place of any transcript; 404 if the server no longer
+                 has it. Transcripts over CHAT_TRANSCRIPT_MAX_CHARS get no key.
     - Optional:  'conversation_history' (list of {role: 'user'|'ai', text: str})
+    - Optional:  'stream': true (or Accept: text/event-stream) to get the answer
+                 as SSE "delta" events followed by a final "done" event
     Forces model to lead with a [HH:MM:SS] timestamp in the answer.
     """
     data = request.get_json(silent=True) or {}
@@ -219,26 +1255,47 @@ def chat_with_video():
     user_query = data.get('user_query', '')
     video_transcript_list = data.get('video_transcript_list')  # preferred
     video_transcript = data.get('video_transcript')            # fallback
+    formatted_transcript = data.get('formatted_transcript')
+    transcript_key = data.get('transcript_key')
     conversation_history = data.get('conversation_history', [])
 
     if not user_query:
         return jsonify({"error": "User query is required"}), 400
 
-    if not video_transcript_list and not video_transcript:
+    if not formatted_transcript and not video_transcript_list and not video_transcript and not transcript_key:
         return jsonify({"error": "Either 'video_transcript_list' or 'video_transcript' is required"}), 400
 
-    # Build formatted transcript for the model
-    formatted_transcript = ""
-    if isinstance(video_transcript_list, list) and video_transcript_list:
-        try:
-            formatted_transcript = " ".join(
-                f"{format_timestamp(item.get('start', 0))} {item.get('text','')}"
-                for item in video_transcript_list
-            )
-        except Exception as e:
-            logging.warning(f"Failed to format transcript list, falling back to flat transcript: {e}")
-    if not formatted_transcript and isinstance(video_transcript, str):
-        formatted_transcript = video_transcript
+    # A known transcript_key skips the upload and the formatting pass entirely
+    known_transcript = lookup_chat_transcript(transcript_key) if isinstance(transcript_key, str) else None
+    if known_transcript is not None:
+        formatted_transcript = known_transcript
+    else:
+        if not formatted_transcript and not video_transcript_list and not video_transcript:
+            return jsonify({"error": "Unknown or expired transcript_key; resend the transcript"}), 404
+
+        # Build formatted transcript for the model, unless the client sent it precomputed
+        if not isinstance(formatted_transcript, str):
+            formatted_transcript = ""
+        if not formatted_transcript and isinstance(video_transcript_list, list) and video_transcript_list:
+            try:
+                formatted_transcript = format_transcript_list(video_transcript_list)
+            except Exception as e:
+                logger.warning("Failed to format transcript list, falling back to flat transcript: %s", e)
+        if not formatted_transcript and isinstance(video_transcript, str):
+            formatted_transcript = video_transcript
+        transcript_key = remember_chat_transcript(formatted_transcript)
+
+    # Near-duplicate standalone questions are answered from the semantic cache
+    semantic_key = None
+    if transcript_key and is_standalone_question(conversation_history):
+        semantic_key = transcript_key
+        cached_answer = find_similar_answer(semantic_key, user_query)
+        if cached_answer:
+            if wants_stream(data):
+                return sse_response(iter([sse_event({"delta": cached_answer}),
+                                          sse_event({"done": True, "response": cached_answer,
+                                                     "transcript_key": transcript_key})]))
+            return jsonify({"response": cached_answer, "transcript_key": transcript_key})
 
     # Prepare prior chat
     history_string = ""
@@ -250,28 +1307,49 @@ def chat_with_video():
             pieces.append(f"{speaker}: {item.get('text','')}")
         history_string = "\n".join(pieces)
 
-    # Prompt to force timestamp-cited answers
-    prompt_template = (
-        "You are Sanchar, an AI video assistant. Answer the user's question based ONLY on the video content below. "
-        "The transcript is formatted with timestamps like [HH:MM:SS].\n\n"
-        "REQUIREMENTS:\n"
-        "1) Begin your answer with the most relevant timestamp in [HH:MM:SS] format.\n"
-        "2) Keep your answer concise and factual.\n"
-        "3) If you cannot find an answer in the video, say so.\n\n"
-        f"--- PREVIOUS CONVERSATION ---\n{history_string}\n\n"
-        f"--- VIDEO CONTENT ---\n{formatted_transcript}\n---\n\n"
-        f"User Query: {user_query}\n\n"
-        "Sanchar's Answer:"
-    )
+    # Prompt to force timestamp-cited answers. Long transcripts go through a
+    # Gemini context cache, so each turn only sends history + question.
+    context_model = get_context_cached_model(formatted_transcript,
+                                             create=not is_standalone_question(conversation_history))
+    if context_model is not None:
+        prompt_template = "".join((
+            CHAT_CACHED_PROMPT_PREFIX,
+            history_string,
+            "\n\nUser Query: ",
+            user_query,
+            CHAT_PROMPT_SUFFIX,
+        ))
+    else:
+        video_context = select_relevant_transcript(formatted_transcript, user_query)
+        prompt_template = "".join((
+            CHAT_PROMPT_PREFIX,
+            history_string,
+            "\n\n--- VIDEO CONTENT ---\n",
+            video_context,
+            "\n---\n\nUser Query: ",
+            user_query,
+            CHAT_PROMPT_SUFFIX,
+        ))
 
-    logging.info(f"Sending chat query to Gemini (prompt size: {len(prompt_template)} chars)")
+    logger.info("Sending chat query to Gemini (prompt size: %d chars)", len(prompt_template))
+    on_answer = None
+    if semantic_key:
+        # Embedding the query for the cache happens off the response path.
+        # Only called for completed generations, never for a cut-off stream.
+        def on_answer(answer: str) -> None:
+            semantic_executor.submit(remember_answer, semantic_key, user_query, answer)
+    if wants_stream(data):
+        return sse_response(stream_chat_answer(prompt_template, on_answer, context_model,
+                                               {"transcript_key": transcript_key}))
     try:
-        ai_raw = call_gemini(prompt_template)
-        ai_response_text = clean_ai_response(ai_raw) or "I'm sorry, I couldn't find an answer to that in the video content."
-        logging.info(f"Gemini response (first 120): {ai_response_text[:120]}...")
-        return jsonify({"response": ai_response_text})
+        ai_raw = call_gemini(prompt_template, context_model)
+        ai_response_text = clean_ai_response(ai_raw) or CHAT_FALLBACK_ANSWER
+        logger.info("Gemini response (first 120): %s...", ai_response_text[:120])
+        if on_answer:
+            on_answer(ai_response_text)
+        return jsonify({"response": ai_response_text, "transcript_key": transcript_key})
     except Exception as e:
-        logging.error(f"Unexpected error during chat with video: {e}", exc_info=True)
+        logger.error("Unexpected error during chat with video: %s", e, exc_info=True)
         return jsonify({"error": "An unexpected error occurred."}), 500
 
 
@@ -279,6 +1357,10 @@ def chat_with_video():
 def summarize_video():
     """
     Two-step summary for long videos.
+    With ?async=1 (or "async": true) returns 202 + job_id; poll /api/job/<job_id>.
+    Ignored where background jobs are disabled (e.g. on Vercel).
+    With "stream": true (or Accept: text/event-stream) the synthesis step is
+    streamed as SSE "delta" events followed by a final "done" event.
     """
     data = request.get_json(silent=True) or {}
     video_transcript = data.get('video_transcript', '')
@@ -286,54 +1368,29 @@ def summarize_video():
     if not video_transcript:
         return jsonify({"error": "Video transcript is required"}), 400
 
-    transcript_chunks = get_transcript_chunks(
-        video_transcript, MAX_TRANSCRIPT_LENGTH_CHARS, OVERLAP_CHARS
-    )
-    if not transcript_chunks:
-        return jsonify({"summary": "There is no content to summarize."})
-
-    summaries: List[str] = []
-    try:
-        # Step 1: Summarize each chunk
-        for i, chunk in enumerate(transcript_chunks):
-            logging.info(f"Summarizing chunk {i+1}/{len(transcript_chunks)}")
-            prompt = (
-                "Provide a detailed summary of the following video content segment. "
-                "Focus on key points, arguments, and conclusions.\n\n"
-                f"---\n{chunk}\n---"
-            )
-            resp = call_gemini(prompt)
-            if resp:
-                summaries.append(resp)
-
-        # Step 2: Synthesize
-        if len(summaries) > 1:
-            logging.info("Creating a final meta-summary from all chunk summaries.")
-            combined = "\n\n---\n\n".join(summaries)
-            final_prompt = (
-                "You are Sanchar, a helpful AI video assistant. "
-                "You will be given several summaries from different parts of a single video. "
-                "Synthesize them into a structured response.\n\n"
-                "FORMAT:\n"
-                "1) Summary: a concise paragraph of the whole video.\n"
-                "2) Key Takeaways: a bulleted list of the most important points.\n\n"
-                f"--- Individual Summaries ---\n{combined}\n\n"
-                "--- Final Synthesized Response ---"
-            )
-            final_summary_text = call_gemini(final_prompt)
-        else:
-            final_summary_text = summaries[0] if summaries else ""
+    if wants_stream(data):
+        return sse_response(stream_summary(video_transcript))
+    if wants_background_job(data):
+        return submit_job(build_summary, video_transcript)
+    payload, status_code = build_summary(video_transcript)
+    return jsonify(payload), status_code
 
-        cleaned = clean_ai_response(final_summary_text)
-        if not cleaned:
-            cleaned = "I could not generate a summary for this video."
 
-        logging.info(f"Generated final summary (first 150): {cleaned[:150]}...")
-        return jsonify({"summary": cleaned})
+@app.route('/api/job/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """Poll a background job started with ?async=1.
 
-    except Exception as e:
-        logging.error(f"Unexpected error during summarization: {e}", exc_info=True)
-        return jsonify({"error": "An unexpected error occurred while generating the summary."}), 500
+    A job still queued or running past its deadline is reported as failed:
+    the worker process running it is gone.
+    """
+    job = cache_get(('job', job_id))
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    if job["status"] != "finished" and time.time() > job.get("deadline", float('inf')):
+        logger.warning("Background job %s passed its deadline while %s.", job_id, job["status"])
+        return jsonify({"job_id": job_id, "status": "failed", "status_code": 500,
+                        "result": {"error": "The background job stopped before finishing; please retry."}}), 200
+    return jsonify({"job_id": job_id, **job}), (200 if job["status"] == "finished" else 202)
 
 
 @app.route('/api/extract-topics', methods=['POST'])
@@ -343,7 +1400,13 @@ def extract_topics():
     if not video_transcript:
         return jsonify({"error": "Video transcript is required"}), 400
 
-    segment = video_transcript[:MAX_TRANSCRIPT_LENGTH_CHARS]
+    cache_key = ('topics', transcript_digest(video_transcript))
+    cached_topics = cache_get(cache_key)
+    if cached_topics:
+        logger.info("Returning cached topics.")
+        return jsonify({"topics": cached_topics})
+
+    segment = video_transcript[:chunk_chars_for(video_transcript)]
     try:
         prompt = (
             "Analyze the following video content and extract the top 5-7 most important topics. "
@@ -354,14 +1417,26 @@ def extract_topics():
         resp = call_gemini(prompt)
         cleaned = clean_ai_response(resp)
         topics_list = [t.strip() for t in cleaned.split(',') if t.strip()]
-        logging.info(f"Extracted topics: {topics_list}")
+        if topics_list:
+            cache_set(cache_key, topics_list)
+        logger.info("Extracted topics: %s", topics_list)
         return jsonify({"topics": topics_list})
     except Exception as e:
-        logging.error(f"Unexpected error during topic extraction: {e}", exc_info=True)
+        logger.error("Unexpected error during topic extraction: %s", e, exc_info=True)
         return jsonify({"error": "An unexpected error occurred while extracting topics."}), 500
 
 
 # --- Main Entry Point ---
+# Standalone gevent server for a single process; FLASK_DEBUG=1 runs the Flask
+# debug server instead. In production run Gunicorn with gevent workers
+# (see gunicorn.conf.py / Procfile) to use every core.
 if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5000))
     # Use host='0.0.0.0' to make server accessible on your local network
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if os.getenv('FLASK_DEBUG') == '1':
+        app.run(host='0.0.0.0', port=port, debug=True)
+    else:
+        from gevent.pywsgi import WSGIServer
+        logger.info("Serving on 0.0.0.0:%d with gevent", port)
+        WSGIServer(('0.0.0.0', port), app).serve_forever()
+
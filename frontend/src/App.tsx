@@ -28,13 +28,6 @@ import ChatInterface from "./components/ChatInterface";
 import { useMediaQuery } from "@mantine/hooks";
 import VideoPlayer from "./components/VideoPlayer";
 
-// === ADDED: typed transcript item for raw list from backend
-interface TranscriptItem {
-  text: string;
-  start: number;
-  duration?: number;
-}
-
 // Define interfaces (kept, but extended)
 interface VideoData {
   title: string;
@@ -43,8 +36,8 @@ interface VideoData {
   videoId: string;
   summary?: string;
   topics?: string[];
-  // === ADDED: raw transcript list with timestamps
-  transcript_list?: TranscriptItem[];
+  // Timestamped transcript text, formatted once by the backend for chat
+  formatted_transcript?: string;
 }
 
 interface ChatMessage {
@@ -86,6 +79,13 @@ const App: React.FC = () => {
   const readyWaitersRef = useRef<Array<() => void>>([]);
   const pendingSeekRef = useRef<number | null>(null);
 
+  // Server-side handle for the current transcript, so chat turns after the
+  // first can skip re-uploading it
+  const transcriptKeyRef = useRef<string | null>(null);
+  // Bumped on every video load, so a chat reply that arrives after the user
+  // switched videos can't store the previous video's key
+  const videoLoadRef = useRef<number>(0);
+
   // REPLACE your current useEffect that loads & creates the YT player with this:
   useEffect(() => {
     // mark all waiters as ready
@@ -266,6 +266,8 @@ const App: React.FC = () => {
     setVideoUrl(url);
     setVideoData(null);
     setChatMessages([]);
+    transcriptKeyRef.current = null;
+    const videoLoad = ++videoLoadRef.current;
     setIsLoading(true);
     setError(null);
 
@@ -285,6 +287,10 @@ const App: React.FC = () => {
       }
 
       const videoDataFetched = await videoInfoResponse.json();
+      // The backend already stored the transcript for chat
+      if (videoDataFetched.transcript_key && videoLoadRef.current === videoLoad) {
+        transcriptKeyRef.current = videoDataFetched.transcript_key;
+      }
 
       const [summaryResult, topicsResult] = await Promise.allSettled([
         fetch("/api/summarize-video", {
@@ -326,7 +332,7 @@ const App: React.FC = () => {
         videoId: videoDataFetched.videoId,
         summary,
         topics,
-        transcript_list: videoDataFetched.transcript_list || [], // === ADDED
+        formatted_transcript: videoDataFetched.formatted_transcript,
       });
 
       setChatMessages([
@@ -375,25 +381,36 @@ const App: React.FC = () => {
     setIsLoading(true);
 
     try {
-      const response = await fetch("/api/chat-with-video", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          user_query: message,
-          // === CHANGED: prefer raw transcript list for best timestamp accuracy
-          video_transcript_list:
-            videoData.transcript_list && videoData.transcript_list.length > 0
-              ? videoData.transcript_list
-              : undefined,
-          // Fallback so older backend still works:
-          video_transcript: videoData.transcript,
-          // === ADDED: short conversational memory
-          conversation_history: chatMessages.slice(-8).map((m) => ({
-            role: m.sender,
-            text: m.text,
-          })),
-        }),
-      });
+      // Only sent when there is no usable transcript_key. One copy is enough:
+      // the precomputed text, else the flat transcript for older backends
+      const transcriptFields = videoData.formatted_transcript
+        ? { formatted_transcript: videoData.formatted_transcript }
+        : { video_transcript: videoData.transcript };
+      const postChat = (fields: object) =>
+        fetch("/api/chat-with-video", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({
+            user_query: message,
+            ...fields,
+            // === ADDED: short conversational memory
+            conversation_history: chatMessages.slice(-8).map((m) => ({
+              role: m.sender,
+              text: m.text,
+            })),
+          }),
+        });
+
+      const videoLoad = videoLoadRef.current;
+      const transcriptKey = transcriptKeyRef.current;
+      let response = await postChat(
+        transcriptKey ? { transcript_key: transcriptKey } : transcriptFields
+      );
+      if (response.status === 404 && transcriptKey) {
+        // The server dropped the key; send the full transcript again
+        if (videoLoadRef.current === videoLoad) transcriptKeyRef.current = null;
+        response = await postChat(transcriptFields);
+      }
 
       if (!response.ok) {
         const errorData = await response.json();
@@ -403,6 +420,9 @@ const App: React.FC = () => {
       }
 
       const data = await response.json();
+      if (data.transcript_key && videoLoadRef.current === videoLoad) {
+        transcriptKeyRef.current = data.transcript_key;
+      }
       const { text: aiResponseText, timestampSeconds } = parseTimestamp(
         data.response
       );
@@ -0,0 +1,10 @@
+# tests/conftest.py
+# Import the Flask app from api/ with a throwaway disk cache, so tests never
+# touch a developer's real ~/.talk2yt_cache.
+
+import os
+import sys
+import tempfile
+
+os.environ['TALK2YT_CACHE_DIR'] = tempfile.mkdtemp(prefix='talk2yt-test-cache-')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
@@ -0,0 +1,62 @@
+# tests/test_chat_transcript.py
+
+import pytest
+
+import wsgi_app
+
+
+class Reply:
+    text = "[00:00:01] It says hello."
+
+
+class EchoModel:
+    cached_content = None
+
+    def generate_content(self, prompt, stream=False):
+        return iter([Reply()]) if stream else Reply()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(wsgi_app, 'model', EchoModel())
+    # Keeps the semantic cache from calling the embedding API
+    monkeypatch.setattr(wsgi_app, 'GEMINI_API_KEY', None)
+    return wsgi_app.app.test_client()
+
+
+def chat(client, **fields):
+    return client.post('/api/chat-with-video', json={"user_query": "What is said?", **fields})
+
+
+def test_key_round_trips_through_the_disk_cache():
+    text = "[00:00:00] round trip"
+    key = wsgi_app.remember_chat_transcript(text)
+    # Another worker process only has the disk cache
+    wsgi_app.chat_transcripts.clear()
+    assert wsgi_app.lookup_chat_transcript(key) == text
+
+
+def test_oversized_transcript_gets_no_key():
+    text = "x" * (wsgi_app.CHAT_TRANSCRIPT_MAX_CHARS + 1)
+    assert wsgi_app.remember_chat_transcript(text) is None
+    assert wsgi_app.lookup_chat_transcript(wsgi_app.make_transcript_key(text)) is None
+
+
+def test_chat_returns_a_key_that_later_turns_can_use(client):
+    first = chat(client, formatted_transcript="[00:00:01] hello from the key test")
+    key = first.get_json()["transcript_key"]
+    assert first.status_code == 200
+    second = chat(client, transcript_key=key)
+    assert second.status_code == 200
+    assert second.get_json()["transcript_key"] == key
+
+
+def test_unknown_key_is_a_404(client):
+    response = chat(client, transcript_key="0" * 32)
+    assert response.status_code == 404
+
+
+def test_unknown_key_with_transcript_falls_back_to_it(client):
+    response = chat(client, transcript_key="0" * 32, video_transcript="hello from the fallback test")
+    assert response.status_code == 200
+    assert response.get_json()["transcript_key"] != "0" * 32
@@ -0,0 +1,74 @@
+# tests/test_context_cache.py
+
+import threading
+
+import pytest
+
+import wsgi_app
+
+
+class FakeCachedContent:
+    created = []
+    fetched = []
+
+    def __init__(self, name):
+        self.name = name
+
+    @classmethod
+    def create(cls, **kwargs):
+        cls.created.append(kwargs["display_name"])
+        return cls(f"cachedContents/{len(cls.created)}")
+
+    @classmethod
+    def get(cls, name):
+        cls.fetched.append(name)
+        return cls(name)
+
+
+@pytest.fixture
+def fake_caching(monkeypatch):
+    FakeCachedContent.created = []
+    FakeCachedContent.fetched = []
+    monkeypatch.setattr(wsgi_app, 'model', object())
+    monkeypatch.setattr(wsgi_app.caching, 'CachedContent', FakeCachedContent)
+    monkeypatch.setattr(wsgi_app.genai.GenerativeModel, 'from_cached_content',
+                        staticmethod(lambda content: ("model", content.name)))
+    wsgi_app.context_cache_models.clear()
+    return FakeCachedContent
+
+
+@pytest.fixture
+def transcript(request):
+    return request.node.name + "x" * int(wsgi_app.CONTEXT_CACHE_MIN_CHARS)
+
+
+def test_short_transcript_is_never_cached(fake_caching):
+    assert wsgi_app.get_context_cached_model("short transcript") is None
+    assert fake_caching.created == []
+
+
+def test_first_turn_does_not_create_a_cache(fake_caching, transcript):
+    assert wsgi_app.get_context_cached_model(transcript, create=False) is None
+    assert fake_caching.created == []
+
+
+def test_concurrent_turns_create_one_cache(fake_caching, transcript):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(wsgi_app.get_context_cached_model(transcript)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert len(fake_caching.created) == 1
+    assert set(results) == {("model", "cachedContents/1")}
+
+
+def test_other_workers_reuse_the_cache_by_name(fake_caching, transcript):
+    created = wsgi_app.get_context_cached_model(transcript)
+    # A different worker process has no local handle, only the disk cache
+    wsgi_app.context_cache_models.clear()
+    reused = wsgi_app.get_context_cached_model(transcript, create=False)
+    assert reused == created
+    assert len(fake_caching.created) == 1
+    assert fake_caching.fetched == [created[1]]
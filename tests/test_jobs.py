@@ -0,0 +1,49 @@
+# tests/test_jobs.py
+
+import time
+
+import wsgi_app
+
+
+def poll(job_id):
+    response = wsgi_app.app.test_client().get(f'/api/job/{job_id}')
+    return response.status_code, response.get_json()
+
+
+def test_running_job_before_deadline_is_pending():
+    wsgi_app.cache_set(('job', 'live'), {"status": "running", "deadline": time.time() + 60})
+    status, body = poll('live')
+    assert status == 202
+    assert body["status"] == "running"
+
+
+def test_job_past_deadline_is_reported_failed():
+    wsgi_app.cache_set(('job', 'stale'), {"status": "running", "deadline": time.time() - 1})
+    status, body = poll('stale')
+    assert status == 200
+    assert body["status"] == "failed"
+    assert body["status_code"] == 500
+    assert "error" in body["result"]
+
+
+def test_finished_job_is_returned_after_deadline():
+    record = {"status": "finished", "status_code": 200, "result": {"summary": "Done."},
+              "deadline": time.time() - 1}
+    wsgi_app.cache_set(('job', 'done'), record)
+    status, body = poll('done')
+    assert status == 200
+    assert body["result"] == {"summary": "Done."}
+
+
+def test_submit_job_runs_to_completion():
+    with wsgi_app.app.test_request_context():
+        body, status = wsgi_app.submit_job(lambda: ({"value": 1}, 200))
+    assert status == 202
+    job_id = body.get_json()["job_id"]
+    for _ in range(50):
+        _, polled = poll(job_id)
+        if polled["status"] == "finished":
+            break
+        time.sleep(0.05)
+    assert polled["status"] == "finished"
+    assert polled["result"] == {"value": 1}
@@ -0,0 +1,118 @@
+# tests/test_semantic_cache.py
+
+import threading
+
+import pytest
+
+import wsgi_app
+
+# Cosine similarity to QUESTION: 0.95 for NEAR_DUPLICATE, 0.85 for DIFFERENT
+QUESTION = "What is this video about?"
+NEAR_DUPLICATE = "What's this video about?"
+DIFFERENT = "Who is speaking in this video?"
+VECTORS = {QUESTION: (1.0, 0.0), NEAR_DUPLICATE: (0.95, 0.3122), DIFFERENT: (0.85, 0.5268)}
+
+
+class Piece:
+    def __init__(self, text):
+        self.text = text
+
+
+class AnswerModel:
+    """Answers every prompt; with `drop`, streams fail after the first piece."""
+    cached_content = None
+
+    def __init__(self, drop=False):
+        self.drop = drop
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        if not stream:
+            return Piece("[00:00:01] A fresh answer.")
+
+        def pieces():
+            yield Piece("[00:00:01] A fresh")
+            if self.drop:
+                raise ConnectionError("connection reset")
+            yield Piece(" answer.")
+        return pieces()
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(wsgi_app, 'GEMINI_API_KEY', 'x')
+    monkeypatch.setattr(wsgi_app, 'embed_query', lambda text: VECTORS[text])
+
+
+@pytest.fixture
+def transcript(request):
+    return f"[00:00:00] {request.node.name}"
+
+
+def use_model(monkeypatch, drop=False):
+    answer_model = AnswerModel(drop)
+    monkeypatch.setattr(wsgi_app, 'model', answer_model)
+    return answer_model
+
+
+def chat(transcript, user_query, **fields):
+    client = wsgi_app.app.test_client()
+    return client.post('/api/chat-with-video',
+                       json={"user_query": user_query, "video_transcript": transcript, **fields})
+
+
+def wait_for_semantic_writes():
+    # Once every semantic_executor worker is parked on the barrier, all
+    # remember_answer calls queued before it have finished
+    workers = wsgi_app.semantic_executor._max_workers
+    barrier = threading.Barrier(workers + 1)
+    for _ in range(workers):
+        wsgi_app.semantic_executor.submit(barrier.wait, 5)
+    barrier.wait(5)
+
+
+def stored_answers(transcript):
+    return list(wsgi_app.semantic_answer_cache.get(wsgi_app.make_transcript_key(transcript)) or ())
+
+
+def test_near_duplicate_question_is_a_hit_and_a_different_one_is_not(transcript):
+    key = wsgi_app.make_transcript_key(transcript)
+    wsgi_app.remember_answer(key, QUESTION, "Cached answer.")
+    assert wsgi_app.find_similar_answer(key, NEAR_DUPLICATE) == "Cached answer."
+    assert wsgi_app.find_similar_answer(key, DIFFERENT) is None
+
+
+def test_cached_answer_is_served_without_calling_the_model(monkeypatch, transcript):
+    answer_model = use_model(monkeypatch)
+    wsgi_app.remember_answer(wsgi_app.make_transcript_key(transcript), QUESTION, "Cached answer.")
+    response = chat(transcript, NEAR_DUPLICATE)
+    assert response.get_json()["response"] == "Cached answer."
+    assert answer_model.prompts == []
+
+
+def test_follow_up_question_bypasses_the_cache(monkeypatch, transcript):
+    answer_model = use_model(monkeypatch)
+    wsgi_app.remember_answer(wsgi_app.make_transcript_key(transcript), QUESTION, "Cached answer.")
+    history = [{"role": "user", "text": "Earlier question"}, {"role": "ai", "text": "Earlier answer"}]
+    response = chat(transcript, NEAR_DUPLICATE, conversation_history=history)
+    assert response.get_json()["response"] == "[00:00:01] A fresh answer."
+    assert len(answer_model.prompts) == 1
+    wait_for_semantic_writes()
+    assert len(stored_answers(transcript)) == 1
+
+
+def test_completed_answer_is_stored(monkeypatch, transcript):
+    use_model(monkeypatch)
+    response = chat(transcript, QUESTION, stream=True)
+    assert b'"done":true' in response.get_data()
+    wait_for_semantic_writes()
+    assert [answer for _, answer in stored_answers(transcript)] == ["[00:00:01] A fresh answer."]
+
+
+def test_cut_off_stream_is_not_stored(monkeypatch, transcript):
+    use_model(monkeypatch, drop=True)
+    response = chat(transcript, QUESTION, stream=True)
+    assert b'"error"' in response.get_data()
+    wait_for_semantic_writes()
+    assert stored_answers(transcript) == []
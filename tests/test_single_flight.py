@@ -0,0 +1,107 @@
+# tests/test_single_flight.py
+
+import threading
+import time
+
+import pytest
+
+from wsgi_app import SingleFlight
+
+N_FOLLOWERS = 5
+# Long enough for follower threads to reach the in-flight call before it ends
+FOLLOWER_START_SECONDS = 0.2
+
+
+def run_concurrently(flight, key, func):
+    """Start a leader call, then followers while it is still running.
+
+    Returns each caller's ("ok", result) or ("error", exception).
+    """
+    entered = threading.Event()
+    release = threading.Event()
+    outcomes = []
+    outcomes_lock = threading.Lock()
+
+    def blocking_func():
+        entered.set()
+        release.wait(5)
+        return func()
+
+    def caller():
+        try:
+            outcome = ("ok", flight.do(key, blocking_func))
+        except Exception as e:
+            outcome = ("error", e)
+        with outcomes_lock:
+            outcomes.append(outcome)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    assert entered.wait(5)
+    followers = [threading.Thread(target=caller) for _ in range(N_FOLLOWERS)]
+    for t in followers:
+        t.start()
+    time.sleep(FOLLOWER_START_SECONDS)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_result():
+    flight = SingleFlight()
+    calls = []
+
+    def func():
+        calls.append(1)
+        return object()
+
+    outcomes = run_concurrently(flight, 'key', func)
+
+    assert len(calls) == 1
+    assert len(outcomes) == N_FOLLOWERS + 1
+    kinds = {kind for kind, _ in outcomes}
+    results = {id(result) for _, result in outcomes}
+    assert kinds == {"ok"}
+    assert len(results) == 1
+
+
+def test_concurrent_callers_share_one_exception():
+    flight = SingleFlight()
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise ValueError("fetch failed")
+
+    outcomes = run_concurrently(flight, 'key', func)
+
+    assert len(calls) == 1
+    assert len(outcomes) == N_FOLLOWERS + 1
+    for kind, error in outcomes:
+        assert kind == "error"
+        assert isinstance(error, ValueError)
+        assert str(error) == "fetch failed"
+
+
+def test_finished_calls_are_not_kept():
+    flight = SingleFlight()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ValueError("transient")
+
+    with pytest.raises(ValueError):
+        flight.do('key', failing)
+    # A failure isn't cached: the next call runs the work again
+    assert flight.do('key', lambda: "recovered") == "recovered"
+    assert flight.do('key', lambda: "again") == "again"
+    assert len(calls) == 1
+    assert flight._calls == {}
+
+
+def test_different_keys_run_independently():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
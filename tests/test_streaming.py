@@ -0,0 +1,64 @@
+# tests/test_streaming.py
+
+import orjson
+import pytest
+
+import wsgi_app
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class DroppingModel:
+    """Streams one piece, then fails like a reset connection."""
+    cached_content = None
+
+    def generate_content(self, prompt, stream=False):
+        if not stream:
+            return Chunk("chunk summary " + str(len(prompt)))
+
+        def pieces():
+            yield Chunk("1) Summary: The video")
+            raise ConnectionError("connection reset")
+        return pieces()
+
+
+def sse_payloads(events):
+    return [orjson.loads(e[len("data: "):]) for e in events]
+
+
+@pytest.fixture
+def dropping_model(monkeypatch):
+    model = DroppingModel()
+    monkeypatch.setattr(wsgi_app, 'model', model)
+    return model
+
+
+def test_stream_gemini_raises_and_memoizes_nothing(dropping_model):
+    prompt = "a prompt that fails mid-stream"
+    received = []
+    with pytest.raises(wsgi_app.GeminiStreamError):
+        for text in wsgi_app.stream_gemini(prompt):
+            received.append(text)
+    assert received == ["1) Summary: The video"]
+    key = wsgi_app.prompt_key(prompt, dropping_model)
+    assert key not in wsgi_app.gemini_response_cache
+
+
+def test_truncated_chat_stream_ends_with_error(dropping_model):
+    answers = []
+    events = sse_payloads(wsgi_app.stream_chat_answer("chat prompt", answers.append))
+    assert events[-1] == {"error": "An unexpected error occurred."}
+    assert not any(e.get("done") for e in events)
+    assert answers == []
+
+
+def test_truncated_summary_stream_is_not_cached(dropping_model):
+    # Several chunks, so the synthesis step is streamed
+    transcript = "word " * (wsgi_app.MAX_TRANSCRIPT_LENGTH_CHARS // 2)
+    events = sse_payloads(wsgi_app.stream_summary(transcript))
+    assert "error" in events[-1]
+    assert not any(e.get("done") for e in events)
+    assert wsgi_app.cache_get(('summary', wsgi_app.transcript_digest(transcript))) is None
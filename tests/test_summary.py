@@ -0,0 +1,107 @@
+# tests/test_summary.py
+
+import threading
+import time
+
+import orjson
+import pytest
+
+import wsgi_app
+
+CHUNK = wsgi_app.MAX_TRANSCRIPT_LENGTH_CHARS
+
+
+class Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+class FlakyModel:
+    """Fails the chunk-summary call for any chunk containing `fail_marker`."""
+    cached_content = None
+
+    def __init__(self, fail_marker=None):
+        self.fail_marker = fail_marker
+
+    def generate_content(self, prompt, stream=False):
+        if self.fail_marker and self.fail_marker in prompt:
+            raise RuntimeError("quota exceeded")
+        text = "a summary of %d chars" % len(prompt)
+        return iter([Reply(text)]) if stream else Reply(text)
+
+
+class CountingModel(FlakyModel):
+    """Records the most chunk-summary calls that were running at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.running = self.peak = 0
+
+    def generate_content(self, prompt, stream=False):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+        return super().generate_content(prompt, stream)
+
+
+@pytest.fixture
+def transcript(request):
+    # Three chunks, each a different letter. Every chunk starts with the test
+    # name so the Gemini response memo can't carry results between tests.
+    name = request.node.name
+    return "".join(name + letter * (CHUNK - len(name)) for letter in "abc")
+
+
+def use_model(monkeypatch, fail_marker=None):
+    monkeypatch.setattr(wsgi_app, 'model', FlakyModel(fail_marker))
+
+
+def cached_summary(transcript):
+    return wsgi_app.cache_get(('summary', wsgi_app.transcript_digest(transcript)))
+
+
+def test_complete_summary_is_cached(monkeypatch, transcript):
+    use_model(monkeypatch)
+    payload, status = wsgi_app.build_summary(transcript)
+    assert status == 200
+    assert "partial" not in payload
+    assert cached_summary(transcript) == payload["summary"]
+
+
+def test_summary_missing_a_chunk_is_flagged_and_not_cached(monkeypatch, transcript):
+    use_model(monkeypatch, fail_marker="b" * 100)
+    payload, status = wsgi_app.build_summary(transcript)
+    assert status == 200
+    assert payload["partial"] is True
+    assert payload["summary"]
+    assert cached_summary(transcript) is None
+
+
+def test_streamed_summary_missing_a_chunk_is_flagged_and_not_cached(monkeypatch, transcript):
+    use_model(monkeypatch, fail_marker="b" * 100)
+    events = [orjson.loads(e[len("data: "):]) for e in wsgi_app.stream_summary(transcript)]
+    assert events[-1]["done"] is True
+    assert events[-1]["partial"] is True
+    assert cached_summary(transcript) is None
+
+
+def test_complete_streamed_summary_is_cached(monkeypatch, transcript):
+    use_model(monkeypatch)
+    events = [orjson.loads(e[len("data: "):]) for e in wsgi_app.stream_summary(transcript)]
+    assert "partial" not in events[-1]
+    assert cached_summary(transcript) == events[-1]["summary"]
+
+
+def test_batches_in_flight_are_bounded(monkeypatch, request):
+    counting = CountingModel()
+    monkeypatch.setattr(wsgi_app, 'model', counting)
+    monkeypatch.setattr(wsgi_app, 'MAX_GEMINI_WORKERS', 2)
+    chunks = [f"{request.node.name} chunk {i}" for i in range(10)]
+    summaries = wsgi_app.batched_summarize(chunks, batch_size=1)
+    assert len(summaries) == 10
+    assert all(summaries)
+    assert counting.peak <= 2
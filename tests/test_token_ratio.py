@@ -0,0 +1,45 @@
+# tests/test_token_ratio.py
+
+import pytest
+
+import wsgi_app
+
+
+class Count:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class CountingModel:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.counted = []
+
+    def count_tokens(self, text):
+        self.counted.append(len(text))
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        return Count(len(text) // 3)
+
+
+@pytest.fixture
+def long_text(request):
+    return request.node.name + "word " * wsgi_app.MAX_TRANSCRIPT_LENGTH_CHARS
+
+
+def test_only_a_sample_is_counted(monkeypatch, long_text):
+    counting = CountingModel()
+    monkeypatch.setattr(wsgi_app, 'model', counting)
+    assert wsgi_app.measure_chars_per_token(long_text) == pytest.approx(3.0)
+    assert counting.counted == [wsgi_app.TOKEN_COUNT_SAMPLE_CHARS]
+    # Cached per transcript
+    wsgi_app.measure_chars_per_token(long_text)
+    assert len(counting.counted) == 1
+
+
+def test_failed_count_is_cached_as_the_default(monkeypatch, long_text):
+    failing = CountingModel(fail=True)
+    monkeypatch.setattr(wsgi_app, 'model', failing)
+    assert wsgi_app.measure_chars_per_token(long_text) == wsgi_app.CHARS_PER_TOKEN
+    assert wsgi_app.measure_chars_per_token(long_text) == wsgi_app.CHARS_PER_TOKEN
+    assert len(failing.counted) == 1
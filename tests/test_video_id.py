@@ -0,0 +1,38 @@
+# tests/test_video_id.py
+
+import pytest
+
+from wsgi_app import MAX_VIDEO_URL_CHARS, extract_youtube_video_id
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize("url", [
+    VIDEO_ID,
+    f"https://youtu.be/{VIDEO_ID}",
+    f"youtu.be/{VIDEO_ID}?t=42",
+    f"https://www.youtube.com/shorts/{VIDEO_ID}",
+    f"https://www.youtube.com/embed/{VIDEO_ID}?autoplay=1",
+    f"https://www.youtube.com/watch?v={VIDEO_ID}",
+    f"https://m.youtube.com/watch?feature=share&v={VIDEO_ID}&t=10s",
+    f"  https://www.youtube.com/watch?v={VIDEO_ID}  ",
+], ids=["bare", "youtu.be", "youtu.be-no-scheme", "shorts", "embed", "watch", "watch-extra-params", "padded"])
+def test_extracts_id(url):
+    assert extract_youtube_video_id(url) == VIDEO_ID
+
+
+@pytest.mark.parametrize("url", [
+    "https://example.com/watch?v=nothing",
+    "https://www.youtube.com/watch?v=short",
+    "not a url at all",
+    "",
+    None,
+], ids=["other-host", "bad-id", "text", "empty", "none"])
+def test_rejects_invalid_input(url):
+    assert extract_youtube_video_id(url) is None
+
+
+def test_rejects_over_long_url():
+    url = f"https://www.youtube.com/watch?v={VIDEO_ID}&pad=" + "x" * MAX_VIDEO_URL_CHARS
+    assert len(url) > MAX_VIDEO_URL_CHARS
+    assert extract_youtube_video_id(url) is None
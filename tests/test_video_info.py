@@ -0,0 +1,30 @@
+# tests/test_video_info.py
+
+import pytest
+
+import wsgi_app
+
+TRANSCRIPT_LIST = [{"text": "hello there", "start": 0.0, "duration": 2.0},
+                   {"text": "general kenobi", "start": 2.0, "duration": 2.5}]
+
+
+@pytest.fixture(autouse=True)
+def fake_youtube(monkeypatch):
+    monkeypatch.setattr(wsgi_app, 'fetch_transcript', lambda video_id: TRANSCRIPT_LIST)
+    monkeypatch.setattr(wsgi_app, 'get_video_metadata_from_webpage', lambda video_id: ("Title", "Description"))
+
+
+def test_payload_has_one_chat_transcript_and_its_key():
+    payload, status = wsgi_app.build_video_info("abcdefghijk")
+    assert status == 200
+    assert payload["transcript"] == "hello there general kenobi"
+    assert "transcript_list" not in payload
+    assert wsgi_app.lookup_chat_transcript(payload["transcript_key"]) == payload["formatted_transcript"]
+
+
+def test_transcript_list_is_opt_in():
+    response = wsgi_app.app.test_client().post(
+        '/api/extract-video-info?include_transcript_list=1',
+        json={"video_url": "https://www.youtube.com/watch?v=abcdefghijk"})
+    assert response.status_code == 200
+    assert response.get_json()["transcript_list"] == TRANSCRIPT_LIST
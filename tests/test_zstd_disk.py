@@ -0,0 +1,75 @@
+# tests/test_zstd_disk.py
+
+import pickle
+
+import pytest
+from diskcache import Cache
+
+from wsgi_app import ZSTD_MAGIC, ZstdDisk
+
+SMALL_VALUE = {"status": "finished", "status_code": 200, "result": {"summary": "Short."}}
+# Pickles well past diskcache's default 32 KB min_file_size, so it is stored in a value file
+LARGE_VALUE = [{"text": f"word{i} hello there", "start": i * 2.5, "duration": 2.0} for i in range(5000)]
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def test_large_value_exceeds_min_file_size(cache_dir):
+    with Cache(cache_dir, disk=ZstdDisk) as cache:
+        assert len(pickle.dumps(LARGE_VALUE)) > cache.disk.min_file_size
+
+
+@pytest.mark.parametrize("value", [SMALL_VALUE, LARGE_VALUE, "plain text", 4.25, False],
+                         ids=["small", "large", "str", "float", "false"])
+def test_round_trip(cache_dir, value):
+    with Cache(cache_dir, disk=ZstdDisk) as cache:
+        cache.set("key", value)
+        assert cache.get("key") == value
+
+
+def test_values_are_stored_compressed(cache_dir):
+    with Cache(cache_dir, disk=ZstdDisk) as cache:
+        cache.set("small", SMALL_VALUE)
+        cache.set("large", LARGE_VALUE)
+    # Read back through the plain Disk to see what actually hit storage
+    with Cache(cache_dir) as raw:
+        for key in ("small", "large"):
+            stored = raw.get(key)
+            assert isinstance(stored, bytes)
+            assert stored.startswith(ZSTD_MAGIC)
+        assert len(raw.get("large")) < len(pickle.dumps(LARGE_VALUE)) // 4
+
+
+def test_reads_entries_written_by_plain_disk(cache_dir):
+    with Cache(cache_dir) as legacy:
+        legacy.set("small", SMALL_VALUE)
+        legacy.set("large", LARGE_VALUE)
+        legacy.set("text", "hello")
+    with Cache(cache_dir, disk=ZstdDisk) as cache:
+        assert cache.get("small") == SMALL_VALUE
+        assert cache.get("large") == LARGE_VALUE
+        assert cache.get("text") == "hello"
+        # Rewritten entries switch to the compressed format
+        cache.set("small", SMALL_VALUE)
+        assert cache.get("small") == SMALL_VALUE
+
+
+def test_missing_key_returns_default(cache_dir):
+    with Cache(cache_dir, disk=ZstdDisk) as cache:
+        assert cache.get("missing") is None
+
+
+def test_memoize_round_trip(cache_dir):
+    calls = []
+    with Cache(cache_dir, disk=ZstdDisk) as cache:
+        @cache.memoize(name="transcript")
+        def fetch(video_id):
+            calls.append(video_id)
+            return LARGE_VALUE
+
+        assert fetch("abcdefghijk") == LARGE_VALUE
+        assert fetch("abcdefghijk") == LARGE_VALUE
+    assert calls == ["abcdefghijk"]